@@ -0,0 +1,348 @@
+"""
+タスク履歴を NumPy の列指向の配列に読み込み、
+カテゴリ（c1..cN）ごとの集計・見積りと完了の統計・バックログのバーンダウンを出す。
+
+Note の 補正前時間 / サブタスクの推定時間 はまとめて配列のまま分に変換するので、
+数千件の履歴でも集計自体はミリ秒で終わる。
+
+    python analytics.py [--input tasks.json] [--save tasks.json]
+                        [--format yaml|json] [--burndown-days 30]
+"""
+
+import argparse
+import datetime
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import yaml
+
+from encoders import FORMATS, encode
+from models import TodoTask, TodoTaskListResponse
+
+CATEGORY_PATTERN = re.compile(r"^c(\d+)$")
+
+# Note の読み込みが支配的なので、libyaml があれば C 実装の Loader を使う
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@dataclass
+class TaskColumns:
+    """
+    1 タスク = 1 行。欠損は estimate 系が NaN、日付が NaT、category が -1。
+    """
+
+    category: np.ndarray  # int64
+    completed: np.ndarray  # bool
+    estimate: np.ndarray  # float64（分）: Note の 補正前時間
+    subtask_estimate: np.ndarray  # float64（分）: サブタスクの推定時間の合計
+    subtask_count: np.ndarray  # int64
+    created: np.ndarray  # datetime64[D]
+    due: np.ndarray  # datetime64[D]
+    completed_on: np.ndarray  # datetime64[D]
+
+    def __len__(self) -> int:
+        return len(self.category)
+
+
+# ----------------------------------------------------------------------
+# 読み込み
+# ----------------------------------------------------------------------
+def parse_times_to_minutes(values: Sequence[str]) -> np.ndarray:
+    """
+    formatter.parse_time_to_minutes の配列版。"0:15" / "15" を分にする。
+    空文字や解釈できない値は NaN になる。
+    """
+    arr = np.char.strip(np.asarray(values, dtype=str))
+    if arr.size == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    parts = np.char.partition(arr, ":")
+    head, sep, tail = parts[:, 0], parts[:, 1], parts[:, 2]
+    has_colon = sep == ":"
+
+    h_str = np.where(has_colon, head, "0")
+    m_str = np.where(has_colon, tail, head)
+    valid = np.char.isdigit(h_str) & np.char.isdigit(m_str)
+
+    h = np.where(valid, h_str, "0").astype(np.int64)
+    m = np.where(valid, m_str, "0").astype(np.int64)
+    return np.where(valid, h * 60 + m, np.nan)
+
+
+def _category_index(categories: list[str]) -> int:
+    # c1..cN のうち一番新しいもの。無ければ -1
+    indexes = [int(m.group(1)) for c in categories if (m := CATEGORY_PATTERN.match(c))]
+    return max(indexes) if indexes else -1
+
+
+def _note_times(content: str) -> tuple[str, list[str]]:
+    """
+    Note(YAML) から 補正前時間 とサブタスクの推定時間を文字列のまま取り出す。
+    Note の形になっていないものは空として扱う。
+    """
+    try:
+        data = yaml.load(content, Loader=YamlLoader)
+    except yaml.YAMLError:
+        return "", []
+    if not isinstance(data, dict):
+        return "", []
+
+    subtasks = data.get("サブタスク") or []
+    return str(data.get("補正前時間") or ""), [
+        str(st.get("推定時間") or "") for st in subtasks if isinstance(st, dict)
+    ]
+
+
+def _date(value: Optional[str]) -> str:
+    # ISO8601 の先頭 10 文字（YYYY-MM-DD）。無ければ NaT
+    return value[:10] if value else "NaT"
+
+
+def build_columns(tasks: list[TodoTask]) -> TaskColumns:
+    n = len(tasks)
+    estimate_raw: list[str] = []
+    subtask_raw: list[str] = []
+    subtask_owner: list[int] = []
+
+    for i, t in enumerate(tasks):
+        content = t.body.content if t.body and t.body.content else ""
+        estimate, subtask_times = _note_times(content) if content.strip() else ("", [])
+        estimate_raw.append(estimate)
+        subtask_raw.extend(subtask_times)
+        subtask_owner.extend([i] * len(subtask_times))
+
+    subtask_minutes = parse_times_to_minutes(subtask_raw)
+    owner = np.asarray(subtask_owner, dtype=np.int64)
+
+    return TaskColumns(
+        category=np.array(
+            [_category_index(t.categories or []) for t in tasks], dtype=np.int64
+        ),
+        completed=np.array([t.status == "completed" for t in tasks], dtype=bool),
+        estimate=parse_times_to_minutes(estimate_raw),
+        subtask_estimate=np.bincount(
+            owner, weights=np.nan_to_num(subtask_minutes), minlength=n
+        ),
+        subtask_count=np.bincount(owner, minlength=n).astype(np.int64),
+        created=np.array(
+            [_date(t.createdDateTime) for t in tasks], dtype="datetime64[D]"
+        ),
+        due=np.array(
+            [_date(t.dueDateTime.dateTime if t.dueDateTime else None) for t in tasks],
+            dtype="datetime64[D]",
+        ),
+        completed_on=np.array(
+            [
+                _date(t.completedDateTime.dateTime if t.completedDateTime else None)
+                for t in tasks
+            ],
+            dtype="datetime64[D]",
+        ),
+    )
+
+
+def load_tasks(path: Path) -> list[TodoTask]:
+    """
+    --save で保存した（Graph の一覧 API と同じ {"value": [...]} 形式の）JSON を読む。
+    """
+    return TodoTaskListResponse.model_validate_json(path.read_bytes()).value
+
+
+def save_tasks(path: Path, tasks: list[TodoTask]) -> None:
+    path.write_text(
+        TodoTaskListResponse(value=tasks).model_dump_json(exclude_none=True),
+        encoding="utf-8",
+    )
+
+
+# ----------------------------------------------------------------------
+# 集計
+# ----------------------------------------------------------------------
+def _stats(values: np.ndarray) -> dict:
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 1),
+        "median": round(float(np.median(values)), 1),
+        "p90": round(float(np.percentile(values, 90)), 1),
+    }
+
+
+def category_totals(cols: TaskColumns) -> list[dict]:
+    """
+    カテゴリごとの件数・見積り合計（分）。-1（カテゴリなし）は "none" として出す。
+    """
+    if len(cols) == 0:
+        return []
+
+    # -1 を 0 番に寄せて bincount する
+    slot = cols.category + 1
+    size = int(slot.max()) + 1
+    estimate = np.nan_to_num(cols.estimate)
+    done = cols.completed
+
+    tasks = np.bincount(slot, minlength=size)
+    completed = np.bincount(slot, weights=done, minlength=size)
+    estimate_total = np.bincount(slot, weights=estimate, minlength=size)
+    estimate_done = np.bincount(slot, weights=estimate * done, minlength=size)
+
+    rows = []
+    for s in np.flatnonzero(tasks):
+        rows.append(
+            {
+                "category": f"c{s - 1}" if s > 0 else "none",
+                "tasks": int(tasks[s]),
+                "completed": int(completed[s]),
+                "estimate_minutes": int(estimate_total[s]),
+                "completed_minutes": int(estimate_done[s]),
+                "remaining_minutes": int(estimate_total[s] - estimate_done[s]),
+            }
+        )
+    return rows
+
+
+def estimate_vs_completion(cols: TaskColumns) -> dict:
+    """
+    見積り（分）の分布を完了・未完了で比べ、完了タスクの期限との差・所要日数も出す。
+    """
+    done = cols.completed
+    has_subtasks = (cols.subtask_count > 0) & ~np.isnan(cols.estimate)
+    ratio = np.full(len(cols), np.nan)
+    np.divide(
+        cols.estimate,
+        cols.subtask_estimate,
+        out=ratio,
+        where=has_subtasks & (cols.subtask_estimate > 0),
+    )
+
+    # 期限より何日遅れて完了したか（負なら前倒し）
+    late = cols.completed_on - cols.due
+    late_days = late[~np.isnat(late)].astype(np.float64)
+    cycle = cols.completed_on - cols.created
+    cycle_days = cycle[~np.isnat(cycle)].astype(np.float64)
+
+    return {
+        "estimate_minutes_completed": _stats(cols.estimate[done]),
+        "estimate_minutes_incomplete": _stats(cols.estimate[~done]),
+        # 補正前時間 ÷ サブタスク推定時間の合計
+        "estimate_to_subtask_ratio": _stats(ratio),
+        "days_late_vs_due": {
+            **_stats(late_days),
+            "on_time_rate": (
+                round(float((late_days <= 0).mean()), 3) if late_days.size else None
+            ),
+        },
+        "days_to_complete": _stats(cycle_days),
+    }
+
+
+def burndown(
+    cols: TaskColumns, today: datetime.date, days: Optional[int] = None
+) -> list[dict]:
+    """
+    日ごとの残りタスク数・残り見積り（分）。作成日が分からないタスクは含めない。
+    """
+    known = ~np.isnat(cols.created)
+    if not known.any():
+        return []
+
+    start = cols.created[known].min()
+    end = np.datetime64(today, "D")
+    length = int((end - start).astype(np.int64)) + 1
+    if length <= 0:
+        return []
+
+    estimate = np.nan_to_num(cols.estimate[known])
+    added_at = (cols.created[known] - start).astype(np.int64)
+    completed_on = cols.completed_on[known]
+    closed = ~np.isnat(completed_on)
+    # 作成日より前に完了扱いのデータがあっても作成日に閉じたことにする
+    closed_at = np.maximum(
+        (completed_on[closed] - start).astype(np.int64), added_at[closed]
+    )
+    in_range = closed_at < length
+
+    opened = np.bincount(added_at, minlength=length)[:length]
+    opened_minutes = np.bincount(added_at, weights=estimate, minlength=length)[:length]
+    done = np.bincount(closed_at[in_range], minlength=length)
+    done_minutes = np.bincount(
+        closed_at[in_range], weights=estimate[closed][in_range], minlength=length
+    )
+
+    remaining = np.cumsum(opened - done)
+    remaining_minutes = np.cumsum(opened_minutes - done_minutes)
+    dates = start + np.arange(length)
+
+    first = 0 if days is None else max(0, length - days)
+    return [
+        {
+            "date": str(dates[i]),
+            "remaining_tasks": int(remaining[i]),
+            "remaining_minutes": int(remaining_minutes[i]),
+        }
+        for i in range(first, length)
+    ]
+
+
+def build_report(
+    cols: TaskColumns, today: datetime.date, burndown_days: Optional[int] = 30
+) -> dict:
+    return {
+        "generated_on": today.isoformat(),
+        "tasks": len(cols),
+        "completed": int(cols.completed.sum()),
+        "categories": category_totals(cols),
+        "estimate_vs_completion": estimate_vs_completion(cols),
+        "burndown": burndown(cols, today, burndown_days),
+    }
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description="タスク履歴の見積り時間を集計する")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        help="Graph から取得せず、--save で保存した JSON を読む",
+    )
+    parser.add_argument(
+        "--save",
+        type=Path,
+        help="Graph から取得したタスクをこの JSON に保存する",
+    )
+    parser.add_argument("--format", choices=FORMATS, default="yaml")
+    parser.add_argument(
+        "--burndown-days",
+        type=int,
+        default=30,
+        help="バーンダウンを直近何日分出すか（0 なら全期間）",
+    )
+    args = parser.parse_args()
+
+    if args.input is not None:
+        tasks = load_tasks(args.input)
+    else:
+        # Graph に繋ぐときだけ Client（と認証）を読み込む
+        from client import Client
+
+        tasks = Client().get_tasks_all()
+        if args.save is not None:
+            save_tasks(args.save, tasks)
+
+    cols = build_columns(tasks)
+    report = build_report(
+        cols, datetime.date.today(), burndown_days=args.burndown_days or None
+    )
+    sys.stdout.write(encode(report, args.format))
+
+
+if __name__ == "__main__":
+    main()
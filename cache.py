@@ -1,52 +1,120 @@
 import msal
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
+from statefile import atomic_write_text, file_lock
+
 dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
 load_dotenv(dotenv_path)
-CLIENT_ID = os.environ["CLIENT_ID"]
+# 認証しない用途（soak.py のモック相手など）でも import できるよう、ここでは必須にしない
+CLIENT_ID = os.environ.get("CLIENT_ID")
 
 AUTHORITY = "https://login.microsoftonline.com/consumers"
 SCOPES = ["Tasks.ReadWrite"]
 CACHE_FILE = os.path.join(os.path.dirname(__file__), "token_cache.bin")
 
+# 期限までこれ（秒）を切ったら取り直す（MSAL がリフレッシュし始めるのと同じ 5 分）
+EXPIRY_MARGIN = 300
+
+# PublicClientApplication は作るたびに authority の discovery（HTTPS）をするので
+# プロセスで 1 つだけ作り、取得したアクセストークンもメモリに持っておく
+_app = None
+_access_token = None
+_expires_at = 0.0
+_lock = threading.Lock()
+
 
 def load_cache():
     cache = msal.SerializableTokenCache()
-    if os.path.exists(CACHE_FILE):
-        cache.deserialize(open(CACHE_FILE, "r").read())
+    with file_lock(CACHE_FILE):
+        _read_cache(cache)
     return cache
 
 
 def save_cache(cache):
+    with file_lock(CACHE_FILE):
+        _write_cache(cache)
+
+
+def _read_cache(cache):
+    if os.path.exists(CACHE_FILE):
+        with open(CACHE_FILE, "r") as f:
+            cache.deserialize(f.read())
+
+
+def _write_cache(cache):
     if cache.has_state_changed:
-        with open(CACHE_FILE, "w") as f:
-            f.write(cache.serialize())
+        atomic_write_text(CACHE_FILE, cache.serialize())
+
+
+def _get_app():
+    global _app
+    if _app is None:
+        _app = msal.PublicClientApplication(
+            client_id=CLIENT_ID,
+            authority=AUTHORITY,
+            token_cache=msal.SerializableTokenCache(),
+        )
+    return _app
+
+
+def get_access_token(force_refresh=False):
+    """
+    アクセストークンを返す。期限まで余裕があればメモリ上の値をそのまま返し、
+    ファイルにもネットワークにも触らない。
+    force_refresh=True（401 が返ったときなど）なら必ず取り直す。
+    """
+    global _access_token, _expires_at
+
+    if not CLIENT_ID:
+        raise RuntimeError(".env に CLIENT_ID が設定されていません")
+
+    with _lock:
+        if (
+            not force_refresh
+            and _access_token is not None
+            and time.time() < _expires_at - EXPIRY_MARGIN
+        ):
+            return _access_token
+
+        # 読み込み → トークン取得（リフレッシュ）→ 保存 までロックを持ったままにする。
+        # 途中で別プロセスが更新したキャッシュを古い内容で上書きしないため。
+        # Device Code Flow の間もそのままなので、他のプロセスは待たされた後に
+        # 保存されたトークンをサイレントで使える
+        with file_lock(CACHE_FILE):
+            result = _acquire_token(force_refresh)
 
+        _access_token = result["access_token"]
+        _expires_at = time.time() + int(result.get("expires_in") or 0)
+        return _access_token
 
-def get_access_token():
-    cache = load_cache()
 
-    app = msal.PublicClientApplication(
-        client_id=CLIENT_ID, authority=AUTHORITY, token_cache=cache
-    )
+def _acquire_token(force_refresh):
+    app = _get_app()
+    cache = app.token_cache
+    # 別プロセスが更新しているかもしれないので、取り直すときはファイルから読み直す
+    _read_cache(cache)
 
     # ① まずキャッシュから取得（サイレント認証）
     accounts = app.get_accounts()
     if accounts:
-        result = app.acquire_token_silent(SCOPES, account=accounts[0])
+        result = app.acquire_token_silent(
+            SCOPES, account=accounts[0], force_refresh=force_refresh
+        )
         if result and "access_token" in result:
-            save_cache(cache)
-            return result["access_token"]
+            _write_cache(cache)
+            return result
 
     # ② キャッシュに無い or 期限切れ → Device Code Flow を実行
     flow = app.initiate_device_flow(scopes=SCOPES)
     print(flow["message"])  # 表示されたURLにアクセスしてコードを入力
 
     result = app.acquire_token_by_device_flow(flow)
-    save_cache(cache)
+    _write_cache(cache)
 
     if "access_token" not in result:
         raise RuntimeError(result)
 
-    return result["access_token"]
+    return result
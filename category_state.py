@@ -5,6 +5,8 @@ import json
 from dataclasses import dataclass
 from pathlib import Path
 
+from statefile import atomic_write_text, file_lock
+
 
 DEFAULT_START = 1
 
@@ -20,8 +22,29 @@ class CategoryState:
     def advance(self) -> None:
         self.current_index += 1
 
+    def advance_if_unchanged(self, path: Path) -> bool:
+        """
+        compare-and-swap で進める。ファイル上の current_index がこの state と
+        同じときだけ +1 して保存し True を返す。別のプロセスが先に進めていたら
+        何も書かずに False を返し、この state をファイルの値に合わせる。
+        """
+        with file_lock(path):
+            stored = _read_state(path)
+            if stored.current_index != self.current_index:
+                self.current_index = stored.current_index
+                return False
+
+            self.advance()
+            _write_state(path, self)
+            return True
+
 
 def load_state(path: Path) -> CategoryState:
+    with file_lock(path):
+        return _read_state(path)
+
+
+def _read_state(path: Path) -> CategoryState:
     if not path.exists():
         return CategoryState()
 
@@ -32,7 +55,13 @@ def load_state(path: Path) -> CategoryState:
 
 
 def save_state(path: Path, state: CategoryState) -> None:
-    path.write_text(
+    with file_lock(path):
+        _write_state(path, state)
+
+
+def _write_state(path: Path, state: CategoryState) -> None:
+    atomic_write_text(
+        path,
         json.dumps(
             {
                 "current_index": state.current_index,
@@ -40,5 +69,4 @@ def save_state(path: Path, state: CategoryState) -> None:
             ensure_ascii=False,
             indent=2,
         ),
-        encoding="utf-8",
     )
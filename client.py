@@ -1,7 +1,7 @@
 import cache
 import requests
 import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from models import (
     TodoTask,
     TodoTaskListResponse,
@@ -12,20 +12,58 @@ from models import (
     CreateTaskPayload,
 )
 
+GRAPH_BASE = "https://graph.microsoft.com/v1.0"
+
 
 class Client:
-    def __init__(self):
-        self.graph_base = "https://graph.microsoft.com/v1.0"
-        self.access_token = cache.get_access_token()
+    def __init__(
+        self, graph_base: str = GRAPH_BASE, access_token: Optional[str] = None
+    ):
+        """
+        graph_base / access_token はモックの Graph を相手にするとき（soak.py）用。
+        access_token を渡した場合は MSAL のキャッシュを使わず、その値を使い続ける。
+        """
+        self.graph_base = graph_base
+        self.fixed_access_token = access_token
+        # 接続を使い回す（デーモンなど長寿命のプロセスで効く）
+        self.session = requests.Session()
+        self.access_token: Optional[str] = None
+        self.refresh_access_token()
+        self.default_list_id = self._get_default_list_id()
+
+    def refresh_access_token(self, force: bool = False) -> None:
+        """
+        アクセストークンを確認し、変わっていればヘッダを更新する。
+        期限まで余裕がある間はメモリ上の値を使うだけなので、リクエストごとに呼んでよい。
+        force=True なら（401 が返ったときなど）キャッシュから取り直す。
+        """
+        access_token = self.fixed_access_token or cache.get_access_token(
+            force_refresh=force
+        )
+        if access_token == self.access_token:
+            return
+
+        self.access_token = access_token
         self.headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json",
         }
-        self.default_list_id = self._get_default_list_id()
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        self.session でリクエストを送る。期限が近ければ先にトークンを取り直し、
+        401 が返ったら 1 回だけ取り直して送り直す。
+        """
+        self.refresh_access_token()
+        resp = self.session.request(method, url, headers=self.headers, **kwargs)
+        if resp.status_code == 401 and self.fixed_access_token is None:
+            self.refresh_access_token(force=True)
+            resp = self.session.request(method, url, headers=self.headers, **kwargs)
+        return resp
 
     def _get_default_list_id(self) -> str:
         url = f"{self.graph_base}/me/todo/lists/Tasks"
-        resp = requests.get(url, headers=self.headers)
+        resp = self._request("GET", url)
         resp.raise_for_status()
         data = resp.json()
         return data["id"]
@@ -45,9 +83,9 @@ class Client:
             body=TodoBody(content=note_yaml),
             categories=categories or [],
         )
-        resp = requests.post(
+        resp = self._request(
+            "POST",
             url,
-            headers=self.headers,
             json=payload.model_dump(mode="json", exclude_none=True),
         )
         resp.raise_for_status()
@@ -62,7 +100,7 @@ class Client:
             "displayName": display_name,
             "isChecked": False,
         }
-        resp = requests.post(url, headers=self.headers, json=body)
+        resp = self._request("POST", url, json=body)
         resp.raise_for_status()
         return ChecklistItem.model_validate(resp.json())
 
@@ -73,7 +111,7 @@ class Client:
             f"{self.default_list_id}/tasks"
             f"?$filter=status ne 'completed'"
         )
-        resp = requests.get(url, headers=self.headers)
+        resp = self._request("GET", url)
         resp.raise_for_status()
 
         # 一旦ラッパーモデルに入れてから .value を返す
@@ -85,7 +123,7 @@ class Client:
             f"{self.graph_base}/me/todo/lists/"
             f"{self.default_list_id}/tasks/{task_id}/checklistItems"
         )
-        cl_resp = requests.get(cl_url, headers=self.headers)
+        cl_resp = self._request("GET", cl_url)
         cl_resp.raise_for_status()
 
         items = ChecklistItemListResponse.model_validate(cl_resp.json())
@@ -103,7 +141,7 @@ class Client:
         url = f"{self.graph_base}/me/todo/lists/{list_id}/tasks?$top=100"
 
         while True:
-            resp = requests.get(url, headers=self.headers)
+            resp = self._request("GET", url)
             resp.raise_for_status()
             data = resp.json()
 
@@ -117,6 +155,47 @@ class Client:
 
         return tasks
 
+    def get_tasks_delta(
+        self, delta_link: Optional[str] = None
+    ) -> Tuple[List["TodoTask"], List[str], str]:
+        """
+        既定リストの tasks を delta クエリで取得する。
+        delta_link が None なら全件（初回同期）、指定すれば前回からの差分だけ返る。
+        (変更・追加されたタスク, 削除されたタスク ID, 次回用の deltaLink) を返す。
+        """
+        if delta_link is None:
+            url = (
+                f"{self.graph_base}/me/todo/lists/"
+                f"{self.default_list_id}/tasks/delta"
+            )
+        else:
+            url = delta_link
+
+        tasks: List["TodoTask"] = []
+        removed_ids: List[str] = []
+
+        while True:
+            resp = self._request("GET", url)
+            resp.raise_for_status()
+            data = resp.json()
+
+            for item in data.get("value", []):
+                # 削除されたものは "@removed" 付きで id だけ返ってくる
+                if "@removed" in item:
+                    removed_ids.append(item["id"])
+                else:
+                    tasks.append(TodoTask.model_validate(item))
+
+            next_link = data.get("@odata.nextLink")
+            if not next_link:
+                break
+            url = next_link
+
+        delta_link = data.get("@odata.deltaLink")
+        if not delta_link:
+            raise ValueError("delta の応答に @odata.deltaLink が含まれていません")
+        return tasks, removed_ids, delta_link
+
     # client.py（Client クラス内に追加）
 
     def update_task_categories(self, task_id: str, categories: list[str]) -> TodoTask:
@@ -129,6 +208,6 @@ class Client:
         )
         body = {"categories": categories}
 
-        resp = requests.patch(url, headers=self.headers, json=body)
+        resp = self._request("PATCH", url, json=body)
         resp.raise_for_status()
         return TodoTask.model_validate(resp.json())
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+
+def copy_to_clipboard(text: str) -> None:
+    """
+    与えられたテキストをクリップボードにコピーする。
+    Windows では clip コマンド、それ以外ではできる範囲で頑張る。
+    """
+    try:
+        if sys.platform.startswith("win"):
+            # Windows: 標準の clip コマンドにパイプで渡す
+            subprocess.run(
+                ["clip"],
+                input=text.encode("utf-16"),
+                check=True,
+            )
+        elif sys.platform == "darwin":
+            # macOS: pbcopy
+            subprocess.run(
+                ["pbcopy"],
+                input=text,
+                text=True,
+                check=True,
+            )
+        else:
+            # Linux 系: xclip が入っていれば使う
+            subprocess.run(
+                ["xclip", "-selection", "clipboard"],
+                input=text,
+                text=True,
+                check=True,
+            )
+    except Exception as e:
+        # 失敗してもアプリ自体は落とさず、メッセージだけ出す
+        print(f"クリップボードへのコピーに失敗しました: {e}")
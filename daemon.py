@@ -0,0 +1,355 @@
+"""
+Client（トークン・既定リスト ID）とタスク一覧のスナップショットを
+メモリに保持し続ける常駐デーモン。
+
+todoctl.py から Unix ソケット経由で export / create / advance を受け付ける。
+1 依頼 = 1 行の JSON、1 応答 = 1 行の JSON
+（{"ok": true, "result": ...} または {"ok": false, "error": "..."}）。
+
+    python daemon.py [--refresh-interval 60]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Optional
+
+from client import Client
+from encoders import check_format
+from formatter import parse_time_to_minutes, format_minutes
+from models import QuotedStr, Note, NoteSubtask, ExportSubtask, ExportTask, TodoTask
+from category_state import load_state
+from export_snapshot import ExportSections
+from main import (
+    STATE_FILE,
+    split_tasks_for_export,
+    build_export_task,
+    export_sections_text,
+    advance_category,
+    create_task_with_note,
+)
+from todoctl import SOCKET_PATH
+
+
+class TodoDaemon:
+    """
+    温まった Client とエクスポート結果のスナップショットを持つ本体。
+    Graph へのアクセスは lock で直列化する。
+    """
+
+    def __init__(self, refresh_interval: float = 60.0):
+        self.client = Client()
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        # スナップショット（どのカテゴリで作ったかも覚えておく）
+        self.sections: Optional[ExportSections] = None
+        self.snapshot_category: Optional[str] = None
+        self.snapshot_at: Optional[float] = None
+        # task id -> (スナップショットを作ったときの lastModifiedDateTime, ExportTask)
+        self.task_cache: dict[str, tuple[Optional[str], ExportTask]] = {}
+
+    # ------------------------------------------------------------------
+    # スナップショット
+    # ------------------------------------------------------------------
+    def _refresh_locked(self, full: bool = False) -> None:
+        """
+        self.lock を取った状態で呼ぶこと。
+        一覧は毎回取り直すが、lastModifiedDateTime が前回と同じタスクは
+        前回の ExportTask を使い回し、checklist は新しいタスク・変わったタスクの
+        分だけ取りに行く。full=True なら全タスクの checklist を取り直す。
+        """
+        current_cat = load_state(STATE_FILE).current_name
+        all_tasks = self.client.get_tasks_all()
+        incomplete_tasks, completed_in_current = split_tasks_for_export(
+            all_tasks, current_cat
+        )
+
+        if full:
+            self.task_cache = {}
+
+        self._set_sections_locked(
+            current_cat,
+            [(t, self._export_task_locked(t)) for t in incomplete_tasks],
+            [(t, self._export_task_locked(t)) for t in completed_in_current],
+        )
+        self.snapshot_at = time.time()
+
+    def _export_task_locked(self, t: TodoTask) -> ExportTask:
+        """
+        スナップショットにあり、そのときから lastModifiedDateTime が変わっていなければ
+        その ExportTask を返す。それ以外は checklist を取りに行って作る。
+        """
+        cached = self.task_cache.get(t.id)
+        if (
+            cached is not None
+            and t.lastModifiedDateTime is not None
+            and cached[0] == t.lastModifiedDateTime
+        ):
+            return cached[1]
+        return build_export_task(self.client, t)
+
+    def _set_sections_locked(
+        self,
+        current_cat: str,
+        incomplete: list[tuple[TodoTask, ExportTask]],
+        completed_in_current: list[tuple[TodoTask, ExportTask]],
+    ) -> None:
+        self.sections = {
+            "incomplete": [(t.id, task) for t, task in incomplete],
+            "completed_in_current": [(t.id, task) for t, task in completed_in_current],
+        }
+        self.task_cache = {
+            t.id: (t.lastModifiedDateTime, task)
+            for t, task in (*incomplete, *completed_in_current)
+        }
+        self.snapshot_category = current_cat
+
+    def refresh_loop(self) -> None:
+        """
+        バックグラウンドで一定間隔ごとにスナップショットを取り直す。
+        """
+        while not self.stop_event.wait(self.refresh_interval):
+            try:
+                with self.lock:
+                    self._refresh_locked()
+            except Exception as e:
+                # 一時的な通信エラーなどでデーモンごと落とさない
+                print(f"スナップショットの更新に失敗しました: {e}")
+
+    # ------------------------------------------------------------------
+    # 各コマンド
+    # ------------------------------------------------------------------
+    def handle(self, request: dict) -> dict:
+        command = request.get("command")
+
+        if command == "ping":
+            return {
+                "pid": os.getpid(),
+                "snapshot_at": _format_timestamp(self.snapshot_at),
+            }
+        if command == "export":
+            fmt = request.get("format") or "yaml"
+            check_format(fmt)
+            return self.export(
+                refresh=bool(request.get("refresh")),
+                diff=bool(request.get("diff")),
+                fmt=fmt,
+            )
+        if command == "refresh":
+            with self.lock:
+                self._refresh_locked(full=True)
+            return {"snapshot_at": _format_timestamp(self.snapshot_at)}
+        if command == "create":
+            return self.create(request)
+        if command == "advance":
+            return self.advance()
+        if command == "stop":
+            self.stop_event.set()
+            return {"stopped": True}
+
+        raise ValueError(f"不明なコマンドです: {command!r}")
+
+    def export(
+        self, refresh: bool = False, diff: bool = False, fmt: str = "yaml"
+    ) -> dict:
+        with self.lock:
+            # 別プロセス（main.py など）がカテゴリを進めていたら取り直す
+            current_cat = load_state(STATE_FILE).current_name
+            if refresh:
+                self._refresh_locked(full=True)
+            elif self.sections is None or self.snapshot_category != current_cat:
+                self._refresh_locked()
+
+            return {
+                "text": export_sections_text(
+                    current_cat, self.sections, fmt=fmt, diff=diff
+                ),
+                "snapshot_at": _format_timestamp(self.snapshot_at),
+            }
+
+    def create(self, request: dict) -> dict:
+        title = str(request.get("title") or "").strip()
+        if not title:
+            raise ValueError("タイトルは必須です。")
+
+        due_date = datetime.datetime.strptime(request["due"], "%Y-%m-%d").date()
+
+        note_subtasks: list[NoteSubtask] = []
+        total_minutes = 0
+        for name, time_str in request.get("subtasks") or []:
+            minutes = parse_time_to_minutes(time_str)
+            total_minutes += minutes
+            note_subtasks.append(
+                NoteSubtask(
+                    name=name,
+                    推定時間=QuotedStr(format_minutes(minutes)),
+                    備考="なし",
+                )
+            )
+
+        # サブタスクが無ければ補正前時間を直接使う
+        if not note_subtasks:
+            total_minutes = parse_time_to_minutes(request["time"])
+
+        note_model = Note(
+            補正前時間=QuotedStr(format_minutes(total_minutes)),
+            サブタスク=note_subtasks,
+            備考=request.get("remark") or "なし",
+        )
+
+        with self.lock:
+            todo = create_task_with_note(self.client, title, due_date, note_model)
+
+            # 作った内容は分かっているので、Graph に取りに行かずスナップショットに足す
+            if self.sections is not None:
+                task = build_export_task(
+                    self.client,
+                    todo,
+                    subtasks=[
+                        ExportSubtask(title=st.name, done=False) for st in note_subtasks
+                    ],
+                )
+                self.sections["incomplete"].append((todo.id, task))
+                # checklist の追加で更新日時が進むので、次の更新で 1 件だけ取り直す
+                self.task_cache[todo.id] = (None, task)
+
+        return {"id": todo.id, "title": todo.title}
+
+    def advance(self) -> dict:
+        with self.lock:
+            # スナップショット後に他端末で追加されたタスクも拾うため取り直す
+            state = load_state(STATE_FILE)
+            all_tasks = self.client.get_tasks_all()
+            incomplete_tasks, _ = split_tasks_for_export(all_tasks, state.current_name)
+            advanced = advance_category(self.client, state, incomplete_tasks)
+            if advanced is None:
+                # 別のプロセスが先に進めていた
+                return {
+                    "advanced": False,
+                    "category": state.current_name,
+                    "updated": 0,
+                }
+
+            new_cat, updated_tasks = advanced
+            # ExportTask にカテゴリは含まれないので、スナップショットから変わっていない
+            # タスクはそのまま使い回せる（判定は PATCH 前の更新日時で行う）。
+            # 新しいカテゴリで完了したタスクはまだ無い
+            self._set_sections_locked(
+                new_cat,
+                [
+                    (after, self._export_task_locked(before))
+                    for before, after in zip(incomplete_tasks, updated_tasks)
+                ],
+                [],
+            )
+            self.snapshot_at = time.time()
+
+        return {
+            "advanced": True,
+            "category": new_cat,
+            "updated": len(updated_tasks),
+        }
+
+
+def _format_timestamp(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+
+# ----------------------------------------------------------------------
+# ソケットサーバ
+# ----------------------------------------------------------------------
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            result = self.server.todo_daemon.handle(request)
+            response = {"ok": True, "result": result}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+        self.wfile.write(
+            (json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8")
+        )
+
+        if self.server.todo_daemon.stop_event.is_set():
+            # serve_forever と別スレッドから止める
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+class _DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, todo_daemon: TodoDaemon):
+        self.todo_daemon = todo_daemon
+        super().__init__(path, _RequestHandler)
+
+
+def _remove_stale_socket() -> None:
+    """
+    前回のソケットファイルが残っていれば消す。
+    既に別のデーモンが応答する場合は RuntimeError。
+    """
+    if not SOCKET_PATH.exists():
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(SOCKET_PATH))
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+        else:
+            raise RuntimeError(f"デーモンは既に起動しています: {SOCKET_PATH}")
+
+    SOCKET_PATH.unlink(missing_ok=True)
+
+
+def serve(refresh_interval: float = 60.0) -> None:
+    _remove_stale_socket()
+
+    todo_daemon = TodoDaemon(refresh_interval=refresh_interval)
+    with todo_daemon.lock:
+        todo_daemon._refresh_locked()
+
+    server = _DaemonServer(str(SOCKET_PATH), todo_daemon)
+    # 自分以外のユーザーからは触れないようにする
+    os.chmod(SOCKET_PATH, 0o600)
+
+    refresher = threading.Thread(target=todo_daemon.refresh_loop, daemon=True)
+    refresher.start()
+
+    print(f"デーモンを起動しました: {SOCKET_PATH} (pid={os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        todo_daemon.stop_event.set()
+        server.server_close()
+        SOCKET_PATH.unlink(missing_ok=True)
+        print("デーモンを停止しました。")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="To Do 常駐デーモン")
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=60.0,
+        help="スナップショットを取り直す間隔（秒）",
+    )
+    args = parser.parse_args()
+    serve(refresh_interval=args.refresh_interval)
+
+
+if __name__ == "__main__":
+    main()
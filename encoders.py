@@ -0,0 +1,122 @@
+"""
+Export の payload（ExportPayload / ExportDiff など）を文字列やストリームに書き出す。
+
+- yaml: libyaml があれば C 実装の CSafeDumper を使う（QuotedStr のクォートは維持）
+- json: pydantic-core でモデルから直接 JSON にする
+- ExportStreamWriter: タスクを 1 件ずつ書き出す（全体を組み立てるのを待たない）
+"""
+
+import json
+from typing import IO, Any
+
+import yaml
+from pydantic import BaseModel
+
+from models import ExportTask
+
+FORMATS = ("yaml", "json")
+
+# QuotedStr の representer は models.py 側で両方の Dumper に登録済み
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def dump_yaml(data: Any) -> str:
+    """
+    yaml.safe_dump(data, allow_unicode=True, sort_keys=False) を
+    C 実装の Dumper で行う。読み込めば同じデータになるが、長い文字列の折り返しや
+    クォートの付け方などが Python 実装と異なることがあり、文字列として同一とは限らない。
+    """
+    return yaml.dump(data, Dumper=YamlDumper, allow_unicode=True, sort_keys=False)
+
+
+def check_format(fmt: str) -> None:
+    """
+    fmt が FORMATS のどれでもなければ ValueError。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(
+            f"不明な形式です: {fmt!r}（{' / '.join(FORMATS)} のいずれかを指定）"
+        )
+
+
+def encode(payload: BaseModel | dict, fmt: str) -> str:
+    """
+    モデル（または素の dict）を fmt（"yaml" / "json"）の文字列にする。
+    """
+    check_format(fmt)
+    if isinstance(payload, dict):
+        if fmt == "json":
+            return json.dumps(payload, ensure_ascii=False, indent=2) + "\n"
+        return dump_yaml(payload)
+
+    if fmt == "json":
+        # model_dump_json は日本語をエスケープせずそのまま出す
+        return payload.model_dump_json(indent=2) + "\n"
+    return dump_yaml(payload.model_dump(mode="python"))
+
+
+class ExportStreamWriter:
+    """
+    ExportPayload と同じ構造の YAML / JSON を、タスク 1 件ずつ out に書き出す。
+
+        writer.begin("c3")
+        writer.begin_section("incomplete", len(tasks))
+        writer.write_task(task)  # 件数分
+        writer.end_section()
+        ...
+        writer.end()
+    """
+
+    def __init__(self, out: IO[str], fmt: str):
+        check_format(fmt)
+        self.out = out
+        self.fmt = fmt
+        self._first_section = True
+        self._first_task = True
+
+    def _write(self, text: str) -> None:
+        self.out.write(text)
+        self.out.flush()
+
+    def begin(self, current_cat: str) -> None:
+        if self.fmt == "json":
+            self._write("{" + _json_key_value("current_category", current_cat))
+        else:
+            self._write(dump_yaml({"current_category": current_cat}))
+
+    def begin_section(self, section: str, count: int) -> None:
+        self._first_task = True
+        if self.fmt == "json":
+            self._write(f', {json.dumps(section)}: {{"tasks": [')
+        elif count == 0:
+            self._write(f"{section}:\n  tasks: []\n")
+        else:
+            self._write(f"{section}:\n  tasks:\n")
+
+    def write_task(self, task: ExportTask) -> None:
+        if self.fmt == "json":
+            sep = "\n" if self._first_task else ",\n"
+            self._write(sep + task.model_dump_json())
+        else:
+            # 1 要素の list として出して、tasks: の下に来るよう 2 桁インデント
+            text = dump_yaml([task.model_dump(mode="python")])
+            # 空行はそのまま（複数行のクォート文字列の中身を変えないため）
+            self._write(
+                "".join(
+                    "  " + line if line.strip("\n") else line
+                    for line in text.splitlines(True)
+                )
+            )
+        self._first_task = False
+
+    def end_section(self) -> None:
+        if self.fmt == "json":
+            self._write("\n]}")
+
+    def end(self) -> None:
+        if self.fmt == "json":
+            self._write("}\n")
+
+
+def _json_key_value(key: str, value: Any) -> str:
+    return f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}"
@@ -0,0 +1,130 @@
+# export_snapshot.py
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+from models import ExportTask, ExportDiff, ExportDiffTask, ExportRemovedTask
+from statefile import atomic_write_text, file_lock
+
+# section 名 -> [(task_id, ExportTask), ...]
+ExportSections = dict[str, list[tuple[str, ExportTask]]]
+
+
+@dataclass
+class SnapshotEntry:
+    hash: str
+    section: str
+    title: str
+
+
+def task_hash(section: str, task: ExportTask) -> str:
+    """
+    出力される内容（section を含む）のハッシュ。
+    model_dump_json は pydantic-core 側で直列化されるので速い。
+    """
+    h = hashlib.sha256(section.encode("utf-8"))
+    h.update(task.model_dump_json().encode("utf-8"))
+    return h.hexdigest()
+
+
+def build_snapshot(sections: ExportSections) -> dict[str, SnapshotEntry]:
+    return {
+        task_id: SnapshotEntry(
+            hash=task_hash(section, task), section=section, title=task.title
+        )
+        for section, items in sections.items()
+        for task_id, task in items
+    }
+
+
+def diff_export(
+    current_cat: str,
+    sections: ExportSections,
+    previous: dict[str, SnapshotEntry],
+) -> tuple[ExportDiff, dict[str, SnapshotEntry]]:
+    """
+    前回の snapshot と比べて、追加・変更・削除されたタスクだけを ExportDiff にする。
+    (差分, 今回の snapshot) を返す。
+    """
+    current = build_snapshot(sections)
+    diff = ExportDiff(current_category=current_cat)
+
+    for section, items in sections.items():
+        for task_id, task in items:
+            prev = previous.get(task_id)
+            if prev is None:
+                diff.added.append(
+                    ExportDiffTask(id=task_id, section=section, task=task)
+                )
+            elif prev.hash != current[task_id].hash:
+                diff.changed.append(
+                    ExportDiffTask(id=task_id, section=section, task=task)
+                )
+
+    for task_id, prev in previous.items():
+        if task_id not in current:
+            diff.removed.append(
+                ExportRemovedTask(id=task_id, section=prev.section, title=prev.title)
+            )
+
+    return diff, current
+
+
+def load_snapshot(path: Path) -> dict[str, SnapshotEntry]:
+    with file_lock(path):
+        return _read_snapshot(path)
+
+
+def save_snapshot(path: Path, snapshot: dict[str, SnapshotEntry]) -> None:
+    with file_lock(path):
+        _write_snapshot(path, snapshot)
+
+
+def diff_and_save_snapshot(
+    path: Path, current_cat: str, sections: ExportSections
+) -> ExportDiff:
+    """
+    前回の snapshot を読み、sections との差分を取り、今回の snapshot を書くまでを
+    1 つのロックの中で行う。同時に走った 2 つの --diff が同じ前回分を読んで
+    片方の記録を上書きしてしまう（変更が出力されずに消える）ことがない。
+    """
+    with file_lock(path):
+        diff, current = diff_export(current_cat, sections, _read_snapshot(path))
+        _write_snapshot(path, current)
+    return diff
+
+
+def _read_snapshot(path: Path) -> dict[str, SnapshotEntry]:
+    if not path.exists():
+        return {}
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return {
+        task_id: SnapshotEntry(
+            hash=entry["hash"],
+            section=entry.get("section", ""),
+            title=entry.get("title", ""),
+        )
+        for task_id, entry in data.get("tasks", {}).items()
+    }
+
+
+def _write_snapshot(path: Path, snapshot: dict[str, SnapshotEntry]) -> None:
+    text = json.dumps(
+        {
+            "tasks": {
+                task_id: {
+                    "hash": entry.hash,
+                    "section": entry.section,
+                    "title": entry.title,
+                }
+                for task_id, entry in snapshot.items()
+            },
+        },
+        ensure_ascii=False,
+        indent=2,
+    )
+    atomic_write_text(path, text)
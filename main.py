@@ -1,10 +1,14 @@
+import argparse
+import contextlib
 import datetime
-import yaml
-import subprocess
 import sys
+import yaml
 from pathlib import Path
+from typing import IO
 
 from client import Client
+from clipboard import copy_to_clipboard
+from encoders import FORMATS, ExportStreamWriter, check_format, encode
 from formatter import parse_time_to_minutes, format_minutes
 from models import (
     QuotedStr,
@@ -13,10 +17,19 @@ from models import (
     ExportSubtask,
     ExportTask,
     ExportData,
+    ExportPayload,
+    TodoTask,
+)
+from category_state import CategoryState, load_state
+from export_snapshot import (
+    ExportSections,
+    build_snapshot,
+    diff_and_save_snapshot,
+    save_snapshot,
 )
-from category_state import load_state, save_state
 
 STATE_FILE = Path(__file__).parent / "category_state.json"
+SNAPSHOT_FILE = Path(__file__).parent / "export_snapshot.json"
 
 
 def input_yn(prompt: str, default_no: bool = True) -> bool:
@@ -30,40 +43,6 @@ def input_yn(prompt: str, default_no: bool = True) -> bool:
     return s.startswith("y")
 
 
-def copy_to_clipboard(text: str) -> None:
-    """
-    与えられたテキストをクリップボードにコピーする。
-    Windows では clip コマンド、それ以外ではできる範囲で頑張る。
-    """
-    try:
-        if sys.platform.startswith("win"):
-            # Windows: 標準の clip コマンドにパイプで渡す
-            subprocess.run(
-                ["clip"],
-                input=text.encode("utf-16"),
-                check=True,
-            )
-        elif sys.platform == "darwin":
-            # macOS: pbcopy
-            subprocess.run(
-                ["pbcopy"],
-                input=text,
-                text=True,
-                check=True,
-            )
-        else:
-            # Linux 系: xclip が入っていれば使う
-            subprocess.run(
-                ["xclip", "-selection", "clipboard"],
-                input=text,
-                text=True,
-                check=True,
-            )
-    except Exception as e:
-        # 失敗してもアプリ自体は落とさず、メッセージだけ出す
-        print(f"クリップボードへのコピーに失敗しました: {e}")
-
-
 # ----------------------------------------------------------------------
 # 取得側: 未完了タスク + サブタスク を ExportData として返す
 # ----------------------------------------------------------------------
@@ -132,57 +111,183 @@ def get_incomplete_tasks_with_subtasks(client: Client) -> ExportData:
     return ExportData(tasks=export_tasks)
 
 
-def build_export_data_from_tasks(client: Client, tasks_raw) -> ExportData:
+def build_export_task(
+    client: Client, t: TodoTask, subtasks: list[ExportSubtask] | None = None
+) -> ExportTask:
     """
-    TodoTask の list を受け取り、ExportData に変換する。
+    TodoTask 1 件を checklist 付きの ExportTask に変換する。
+    checklist の中身が分かっている場合（作成直後など）は subtasks に渡せば
+    Graph に取りに行かない。
     """
-    export_tasks: list[ExportTask] = []
+    if t.dueDateTime and t.dueDateTime.dateTime:
+        due = t.dueDateTime.dateTime[:10]
+    else:
+        due = None
 
-    for t in tasks_raw:
-        task_id = t.id
-        title = t.title
+    note_raw = ""
+    if t.body and t.body.content:
+        note_raw = t.body.content
 
-        if t.dueDateTime and t.dueDateTime.dateTime:
-            due = t.dueDateTime.dateTime[:10]
+    note_value: Note | str | None = None
+    if note_raw.strip():
+        try:
+            parsed_yaml = yaml.safe_load(note_raw)
+        except yaml.YAMLError:
+            note_value = note_raw
         else:
-            due = None
-
-        note_raw = ""
-        if t.body and t.body.content:
-            note_raw = t.body.content
-
-        note_value: Note | str | None = None
-        if note_raw.strip():
-            try:
-                parsed_yaml = yaml.safe_load(note_raw)
-            except yaml.YAMLError:
-                note_value = note_raw
-            else:
-                if isinstance(parsed_yaml, dict):
-                    try:
-                        note_value = Note.model_validate(parsed_yaml)
-                    except Exception:
-                        note_value = note_raw
-                else:
+            if isinstance(parsed_yaml, dict):
+                try:
+                    note_value = Note.model_validate(parsed_yaml)
+                except Exception:
                     note_value = note_raw
+            else:
+                note_value = note_raw
 
-        checklist_items = client.get_checklist_items(task_id)
-        subtasks_export = [
+    if subtasks is None:
+        checklist_items = client.get_checklist_items(t.id)
+        subtasks = [
             ExportSubtask(title=item.displayName, done=bool(item.isChecked))
             for item in checklist_items
         ]
 
-        export_tasks.append(
-            ExportTask(
-                title=title,
-                due=due,
-                note=note_value,
-                subtasks=subtasks_export,
-                recurrence=t.recurrence,
-            )
-        )
+    return ExportTask(
+        title=t.title,
+        due=due,
+        note=note_value,
+        subtasks=subtasks,
+        recurrence=t.recurrence,
+    )
+
+
+def build_export_data_from_tasks(client: Client, tasks_raw) -> ExportData:
+    """
+    TodoTask の list を受け取り、ExportData に変換する。
+    """
+    return ExportData(tasks=[build_export_task(client, t) for t in tasks_raw])
+
+
+def split_tasks_for_export(
+    all_tasks: list[TodoTask], current_cat: str
+) -> tuple[list[TodoTask], list[TodoTask]]:
+    """
+    全タスクを「未完了」と「現在カテゴリで完了したもの」に振り分ける。
+    """
+    incomplete_tasks = [t for t in all_tasks if t.status != "completed"]
+    completed_in_current = [
+        t
+        for t in all_tasks
+        if t.status == "completed" and current_cat in (t.categories or [])
+    ]
+    return incomplete_tasks, completed_in_current
+
+
+def build_export_sections(
+    client: Client,
+    incomplete_tasks: list[TodoTask],
+    completed_in_current: list[TodoTask],
+) -> ExportSections:
+    """
+    振り分けたタスクを (task_id, ExportTask) の list にしてセクションごとにまとめる。
+    """
+    return {
+        "incomplete": [(t.id, build_export_task(client, t)) for t in incomplete_tasks],
+        "completed_in_current": [
+            (t.id, build_export_task(client, t)) for t in completed_in_current
+        ],
+    }
 
-    return ExportData(tasks=export_tasks)
+
+def build_export_payload(current_cat: str, sections: ExportSections) -> ExportPayload:
+    """
+    「リストを取得」で出力する payload を組み立てる。
+    """
+    return ExportPayload(
+        current_category=current_cat,
+        **{
+            section: ExportData(tasks=[task for _, task in items])
+            for section, items in sections.items()
+        },
+    )
+
+
+def export_sections_text(
+    current_cat: str,
+    sections: ExportSections,
+    fmt: str = "yaml",
+    diff: bool = False,
+) -> str:
+    """
+    sections を fmt（"yaml" / "json"）の文字列にし、
+    今回出力した内容を SNAPSHOT_FILE に記録する。
+    diff=True なら前回の記録から追加・変更・削除されたタスクだけを出力する。
+    """
+    # 形式が不正なまま snapshot だけ進めてしまわないよう先に確かめる
+    check_format(fmt)
+    if diff:
+        # 前回分の読み込みから今回分の記録までを 1 つのロックの中で行う
+        payload = diff_and_save_snapshot(SNAPSHOT_FILE, current_cat, sections)
+    else:
+        payload = build_export_payload(current_cat, sections)
+        save_snapshot(SNAPSHOT_FILE, build_snapshot(sections))
+
+    return encode(payload, fmt)
+
+
+def stream_export(
+    client: Client,
+    out: IO[str],
+    fmt: str,
+    current_cat: str,
+    incomplete_tasks: list[TodoTask],
+    completed_in_current: list[TodoTask],
+) -> ExportSections:
+    """
+    export_sections_text と同じ内容を、checklist を取得したタスクから順に
+    out へ書き出す。今回の内容は SNAPSHOT_FILE に記録する。
+    """
+    writer = ExportStreamWriter(out, fmt)
+    writer.begin(current_cat)
+
+    sections: ExportSections = {}
+    for section, tasks in (
+        ("incomplete", incomplete_tasks),
+        ("completed_in_current", completed_in_current),
+    ):
+        writer.begin_section(section, len(tasks))
+        items = []
+        for t in tasks:
+            task = build_export_task(client, t)
+            writer.write_task(task)
+            items.append((t.id, task))
+        writer.end_section()
+        sections[section] = items
+
+    writer.end()
+    save_snapshot(SNAPSHOT_FILE, build_snapshot(sections))
+    return sections
+
+
+def advance_category(
+    client: Client, state: CategoryState, incomplete_tasks: list[TodoTask]
+) -> tuple[str, list[TodoTask]] | None:
+    """
+    カテゴリナンバを進めて保存し、未完了タスク全ての categories を
+    新しいカテゴリに上書きする。(新しいカテゴリ名, 更新後のタスク) を返す。
+    state を読んだ後に別のプロセスが先に進めていた場合は何もせず None を返す
+    （state はファイル上の最新値に更新される）。
+    """
+    # 1) state を進める（current_index += 1 を compare-and-swap で）
+    if not state.advance_if_unchanged(STATE_FILE):
+        return None
+    new_cat = state.current_name
+
+    # 2) 未完了タスク全ての categories を new_cat に上書き
+    #    （=「未完了タスクは全て最新カテゴリに属する」）
+    updated = [
+        client.update_task_categories(t.id, [new_cat]) for t in incomplete_tasks
+    ]
+
+    return new_cat, updated
 
 
 def export_incomplete_tasks_yaml(client: Client) -> str:
@@ -192,12 +297,48 @@ def export_incomplete_tasks_yaml(client: Client) -> str:
     """
     data = get_incomplete_tasks_with_subtasks(client)
 
-    # Pydantic モデル → Python dict
-    payload = data.model_dump(mode="python")
-
     # QuotedStr は models 側で representer が登録済みなので
     # 補正前時間 / サブタスクの推定時間 が必ずダブルクオートで出る
-    return yaml.safe_dump(payload, allow_unicode=True, sort_keys=False)
+    return encode(data, "yaml")
+
+
+# ----------------------------------------------------------------------
+# 作成側: Note(Pydantic) からタスク & checklist を作る
+# ----------------------------------------------------------------------
+def dump_note_yaml(note_model: Note) -> str:
+    """
+    Note モデルを Microsoft To Do の Note に書き込む YAML 文字列にする。
+    """
+    # 日本語をそのまま出したいので allow_unicode=True
+    return yaml.safe_dump(
+        note_model.model_dump(mode="python"),
+        allow_unicode=True,
+        sort_keys=False,
+    )
+
+
+def create_task_with_note(
+    client: Client,
+    title: str,
+    due_date: datetime.date,
+    note_model: Note,
+) -> TodoTask:
+    """
+    現在カテゴリを付けてタスクを作成し、Note のサブタスクを
+    checklistItems として追加する。
+    """
+    state = load_state(STATE_FILE)
+    todo = client.create_task(
+        title=title,
+        due_date=due_date,
+        note_yaml=dump_note_yaml(note_model),
+        categories=[state.current_name],
+    )
+
+    for st in note_model.サブタスク:
+        client.add_checklist_item(todo.id, st.name)
+
+    return todo
 
 
 # ----------------------------------------------------------------------
@@ -288,12 +429,7 @@ def create_task_interactive(client: Client) -> None:
         備考=task_note_remark,
     )
 
-    # YAML 生成（日本語をそのまま出したいので allow_unicode=True）
-    note_yaml = yaml.safe_dump(
-        note_model.model_dump(mode="python"),
-        allow_unicode=True,
-        sort_keys=False,
-    )
+    note_yaml = dump_note_yaml(note_model)
 
     print("\n--- 作成される Note (YAML) ---")
     print(note_yaml)
@@ -306,21 +442,14 @@ def create_task_interactive(client: Client) -> None:
         print("キャンセルしました。")
         return
 
-    # タスクを作成（client.py の Client を利用）
-    state = load_state(STATE_FILE)
-    current_cat = state.current_name
-    todo = client.create_task(
-        title=title, due_date=due_date, note_yaml=note_yaml, categories=[current_cat]
-    )
-    task_id = todo.id
+    # タスクを作成し、サブタスク → checklistItem として追加
+    todo = create_task_with_note(client, title, due_date, note_model)
 
-    print(f"タスクを作成しました: {todo.title} (id={task_id})")
+    print(f"タスクを作成しました: {todo.title} (id={todo.id})")
 
-    # サブタスク → checklistItem として追加
     if note_subtasks:
-        print("サブタスク（checklistItems）を追加します...")
+        print("サブタスク（checklistItems）を追加しました:")
         for st in note_subtasks:
-            client.add_checklist_item(task_id, st.name)
             print(f"  - {st.name}")
 
     print("完了しました 🎉")
@@ -329,7 +458,50 @@ def create_task_interactive(client: Client) -> None:
 # ----------------------------------------------------------------------
 # CLI 本体
 # ----------------------------------------------------------------------
-def run_cli() -> None:
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Microsoft To Do を対話的に操作する")
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="前回の出力から追加・変更・削除されたタスクだけを出力する",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="yaml",
+        help="リストの出力形式",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="タスクを取得した順に 1 件ずつ書き出す（クリップボードにはコピーしない）",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="標準出力ではなくこのファイルに書き出す",
+    )
+    parser.add_argument(
+        "--no-clipboard",
+        dest="clipboard",
+        action="store_false",
+        help="出力をクリップボードにコピーしない",
+    )
+    return parser
+
+
+def open_output(output: Path | None) -> contextlib.AbstractContextManager[IO[str]]:
+    if output is None:
+        return contextlib.nullcontext(sys.stdout)
+    return open(output, "w", encoding="utf-8")
+
+
+def run_cli(argv: list[str] | None = None) -> None:
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.stream and args.diff:
+        parser.error("--stream と --diff は同時に指定できません")
+
     client = Client()
 
     while True:
@@ -347,45 +519,51 @@ def run_cli() -> None:
                 client.get_tasks_all()
             )  # 完了・未完了すべて取得 :contentReference[oaicite:6]{index=6}
 
-            incomplete_tasks = [t for t in all_tasks if t.status != "completed"]
-            completed_in_current = [
-                t
-                for t in all_tasks
-                if t.status == "completed" and current_cat in (t.categories or [])
-            ]
-
-            payload = {
-                "current_category": current_cat,
-                "incomplete": build_export_data_from_tasks(
-                    client, incomplete_tasks
-                ).model_dump(mode="python"),
-                "completed_in_current": build_export_data_from_tasks(
-                    client, completed_in_current
-                ).model_dump(mode="python"),
-            }
-
-            yaml_text = yaml.safe_dump(payload, allow_unicode=True, sort_keys=False)
-            print(yaml_text)
-
-            copy_to_clipboard(yaml_text)
-            print("\n(上記の YAML をクリップボードにコピーしました)\n")
+            incomplete_tasks, completed_in_current = split_tasks_for_export(
+                all_tasks, current_cat
+            )
+            if args.stream:
+                with open_output(args.output) as out:
+                    stream_export(
+                        client,
+                        out,
+                        args.format,
+                        current_cat,
+                        incomplete_tasks,
+                        completed_in_current,
+                    )
+            else:
+                sections = build_export_sections(
+                    client, incomplete_tasks, completed_in_current
+                )
+                text = export_sections_text(
+                    current_cat, sections, fmt=args.format, diff=args.diff
+                )
+                with open_output(args.output) as out:
+                    out.write(text)
+
+                if args.clipboard:
+                    copy_to_clipboard(text)
+                    print(
+                        f"\n(出力した {args.format.upper()} をクリップボードにコピーしました)\n"
+                    )
+
+            if args.output is not None:
+                print(f"{args.output} に書き出しました。")
 
             # ---- ここからが「advance したら未完了カテゴリを +1」処理 ----
             advance = input_yn("カテゴリナンバを進めますか？[y/N]: ", default_no=True)
             if advance:
-                # 1) state を進める
-                state.advance()  # current_index += 1 :contentReference[oaicite:7]{index=7}
-                save_state(STATE_FILE, state)
-                new_cat = state.current_name
-
-                # 2) 未完了タスク全ての categories を new_cat に上書き
-                #    （=「未完了タスクは全て最新カテゴリに属する」）
-                for t in incomplete_tasks:
-                    client.update_task_categories(t.id, [new_cat])
-
-                print(
-                    f"カテゴリを {new_cat} に進め、未完了タスクのカテゴリを一括更新しました。"
-                )
+                advanced = advance_category(client, state, incomplete_tasks)
+                if advanced is None:
+                    print(
+                        f"別のプロセスが先にカテゴリを {state.current_name} に"
+                        "進めていたため、何もしませんでした。"
+                    )
+                else:
+                    print(
+                        f"カテゴリを {state.current_name} に進め、未完了タスクのカテゴリを一括更新しました。"
+                    )
         else:
             create_task_interactive(client)
 
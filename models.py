@@ -57,6 +57,9 @@ class TodoTask(BaseModel):
     body: Optional[TodoBody] = None
     recurrence: Optional[Recurrence] = None  # ← ここで Graph の recurrence も保持
     categories: list[str] = []
+    lastModifiedDateTime: Optional[str] = None  # 変更検知（watch.py）用
+    createdDateTime: Optional[str] = None  # 以下 2 つは analytics.py 用
+    completedDateTime: Optional[DueDateTime] = None  # 形は dueDateTime と同じ
 
 
 class TodoTaskListResponse(BaseModel):
@@ -89,12 +92,15 @@ class QuotedStr(str):
 def quoted_str_representer(dumper, data):
     return dumper.represent_scalar(
         "tag:yaml.org,2002:str",
-        data,
+        str(data),  # CSafeDumper は str のサブクラスを受け付けない
         style='"',  # ← ダブルクォート強制
     )
 
 
 yaml.add_representer(QuotedStr, quoted_str_representer, Dumper=yaml.SafeDumper)
+# libyaml 版（encoders.py で使う）にも同じ representer を登録しておく
+if hasattr(yaml, "CSafeDumper"):
+    yaml.add_representer(QuotedStr, quoted_str_representer, Dumper=yaml.CSafeDumper)
 
 
 class NoteSubtask(BaseModel):
@@ -158,3 +164,32 @@ class ExportTask(BaseModel):
 
 class ExportData(BaseModel):
     tasks: List[ExportTask]
+
+
+class ExportPayload(BaseModel):
+    # 「リストを取得」で出力する全体
+    current_category: str
+    incomplete: ExportData
+    completed_in_current: ExportData
+
+
+# ------------------------ 差分 Export 用モデル ------------------------
+
+
+class ExportDiffTask(BaseModel):
+    id: str
+    section: str  # "incomplete" / "completed_in_current"
+    task: ExportTask
+
+
+class ExportRemovedTask(BaseModel):
+    id: str
+    section: str
+    title: str
+
+
+class ExportDiff(BaseModel):
+    current_category: str
+    added: List[ExportDiffTask] = []
+    changed: List[ExportDiffTask] = []
+    removed: List[ExportRemovedTask] = []
@@ -0,0 +1,590 @@
+"""
+Client.create_task / add_checklist_item / update_task_categories を
+一定のレートで回し続ける負荷・耐久（soak）テスト。
+
+既定ではローカルにモックの Graph エンドポイント（別プロセス）を立て、
+そこに対してレイテンシのパーセンタイル・エラー率・429 率・RSS の推移を記録し、
+バージョン間で比較できる JSON のレポートを書き出す。
+
+    python soak.py --rate 120 --duration 3600 --label v1.2
+    python soak.py --mock-limit 600 --mock-latency 50   # Graph 並みに絞る
+"""
+
+import argparse
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from client import Client
+from main import dump_note_yaml
+from models import QuotedStr, Note, NoteSubtask
+
+OPERATIONS = ("create_task", "add_checklist_item", "update_task_categories")
+# ワーカーごとの Client 作成（既定リスト ID の取得）。失敗したら間を空けて作り直す
+CONNECT_OPERATION = "connect"
+CONNECT_RETRY_INTERVAL = 1.0
+
+
+# ----------------------------------------------------------------------
+# モック Graph
+# ----------------------------------------------------------------------
+class _TokenBucket:
+    """
+    per_minute 回/分・最大 burst 回まで連続で通す。0 なら制限なし。
+    """
+
+    def __init__(self, per_minute: float, burst: float):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> Optional[float]:
+        """
+        通せるなら None、足りなければ次に通せるまでの秒数（Retry-After）を返す。
+        """
+        if self.rate <= 0:
+            return None
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate
+
+
+class _MockGraphHandler(BaseHTTPRequestHandler):
+    # keep-alive にして Client の Session が接続を使い回せるようにする
+    protocol_version = "HTTP/1.1"
+    # ヘッダと本文を別々に送るので、Nagle の遅延が計測に混ざらないようにする
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_PATCH(self) -> None:
+        self._handle("PATCH")
+
+    def _send(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        # 429 を返す場合も keep-alive のため本文は読み切る
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        retry_after = self.server.throttle.acquire()
+        if retry_after is not None:
+            self._send(
+                429,
+                {"error": {"code": "TooManyRequests"}},
+                {"Retry-After": str(math.ceil(retry_after))},
+            )
+            return
+
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+
+        # /v1.0/me/todo/lists/{list}/tasks/{task}/checklistItems
+        parts = urlsplit(self.path).path.strip("/").split("/")[1:]
+        route = parts[:3] == ["me", "todo", "lists"]
+        tail = parts[3:]
+
+        # 何も溜め込まない（RSS の計測を邪魔しない）ように、受けた内容から応答を作る
+        if route and method == "GET" and tail == ["Tasks"]:
+            self._send(200, {"id": "mock-list", "displayName": "Tasks"})
+        elif route and method == "POST" and tail[1:] == ["tasks"]:
+            self._send(
+                201,
+                {
+                    "id": uuid.uuid4().hex,
+                    "title": body.get("title", ""),
+                    "status": "notStarted",
+                    "body": body.get("body"),
+                    "dueDateTime": body.get("dueDateTime"),
+                    "categories": body.get("categories", []),
+                },
+            )
+        elif route and method == "POST" and len(tail) == 4:
+            self._send(
+                201,
+                {
+                    "id": uuid.uuid4().hex,
+                    "displayName": body.get("displayName", ""),
+                    "isChecked": bool(body.get("isChecked")),
+                },
+            )
+        elif route and method == "PATCH" and len(tail) == 3:
+            self._send(
+                200,
+                {
+                    "id": tail[2],
+                    "title": "soak",
+                    "status": "notStarted",
+                    "categories": body.get("categories", []),
+                },
+            )
+        else:
+            self._send(404, {"error": {"code": "NotFound"}})
+
+
+class _MockGraphServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, limit_per_minute: float, burst: float, latency_ms: float):
+        self.throttle = _TokenBucket(limit_per_minute, burst)
+        self.latency = latency_ms / 1000.0
+        super().__init__(("127.0.0.1", 0), _MockGraphHandler)
+
+
+def _run_mock_server(conn, limit_per_minute: float, burst: float, latency_ms: float):
+    server = _MockGraphServer(limit_per_minute, burst, latency_ms)
+    conn.send(server.server_address[1])
+    conn.close()
+    server.serve_forever()
+
+
+def start_mock_server(
+    limit_per_minute: float, burst: float, latency_ms: float
+) -> tuple[multiprocessing.Process, str]:
+    """
+    モックを別プロセスで起動し、(プロセス, graph_base) を返す。
+    """
+    parent_conn, child_conn = multiprocessing.Pipe()
+    proc = multiprocessing.Process(
+        target=_run_mock_server,
+        args=(child_conn, limit_per_minute, burst, latency_ms),
+        daemon=True,
+    )
+    proc.start()
+    port = parent_conn.recv()
+    return proc, f"http://127.0.0.1:{port}/v1.0"
+
+
+# ----------------------------------------------------------------------
+# 計測
+# ----------------------------------------------------------------------
+class LatencyHistogram:
+    """
+    対数幅のバケツに数えるので、何時間回してもメモリは一定。
+    パーセンタイルはバケツの上端（誤差 10% 以内）で返す。
+    """
+
+    MIN_MS = 0.1
+    FACTOR = 1.1
+    BUCKETS = 170  # 0.1ms * 1.1^170 ≒ 1000 秒まで
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.total = 0
+        self.max_ms = 0.0
+
+    def record(self, ms: float) -> None:
+        if ms <= self.MIN_MS:
+            index = 0
+        else:
+            index = int(math.log(ms / self.MIN_MS) / math.log(self.FACTOR)) + 1
+        self.counts[min(index, self.BUCKETS - 1)] += 1
+        self.total += 1
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if self.total == 0:
+            return None
+        rank = math.ceil(self.total * p / 100.0)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(self.MIN_MS * self.FACTOR**index, self.max_ms), 2)
+        return round(self.max_ms, 2)
+
+
+class OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.ok = 0
+        self.throttled = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+    def summary(self, elapsed: float) -> dict:
+        count = self.count or 1
+        return {
+            "count": self.count,
+            "ok": self.ok,
+            "ok_per_minute": round(self.ok / elapsed * 60.0, 2),
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "throttle_rate": round(self.throttled / count, 4),
+            "error_rate": round(self.errors / count, 4),
+            "latency_ms": {
+                "p50": self.latency.percentile(50),
+                "p90": self.latency.percentile(90),
+                "p99": self.latency.percentile(99),
+                "max": round(self.latency.max_ms, 2),
+            },
+        }
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    現在の RSS。Linux は /proc から、それ以外は取れる範囲（ピーク値）で。
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、その他は KiB
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return None if value is None else round(value / (1024 * 1024), 2)
+
+
+# ----------------------------------------------------------------------
+# 本体
+# ----------------------------------------------------------------------
+class SoakRunner:
+    """
+    1 イテレーション = create_task → add_checklist_item → update_task_categories。
+    イテレーションを rate_per_minute 回/分の予定時刻に並べ、workers 本のスレッドで
+    順に消化する（遅れたら追いつくまで間を空けずに回す）。
+    """
+
+    def __init__(
+        self,
+        graph_base: str,
+        access_token: str,
+        rate_per_minute: float,
+        duration: float,
+        workers: int,
+        sample_interval: float,
+    ):
+        self.graph_base = graph_base
+        self.access_token = access_token
+        self.period = 60.0 / rate_per_minute
+        self.duration = duration
+        self.workers = workers
+        self.sample_interval = sample_interval
+
+        self.lock = threading.Lock()
+        self.stats = {op: OperationStats() for op in (CONNECT_OPERATION, *OPERATIONS)}
+        self.timeline: list[dict] = []
+        # 予定に組み込んだ数と、3 つの操作が全て成功した数
+        self.iterations = 0
+        self.completed_iterations = 0
+        self.active_workers = 0
+        # Client を作れないまま、または想定外の例外で止まったワーカー
+        self.failed_workers: list[str] = []
+        self.finished = threading.Event()
+        self.note_yaml = dump_note_yaml(
+            Note(
+                補正前時間=QuotedStr("0:15"),
+                サブタスク=[NoteSubtask(name="soak", 推定時間="0:15", 備考="なし")],
+                備考="soak test",
+            )
+        )
+
+    def _take_slot(self) -> Optional[tuple[int, float]]:
+        """
+        次のイテレーションの (番号, 予定時刻)。期間を過ぎたら None。
+        """
+        with self.lock:
+            n = self.iterations
+            slot = self.started + n * self.period
+            if slot >= self.ends:
+                return None
+            self.iterations += 1
+            return n, slot
+
+    def _call(self, op: str, fn: Callable, *args, **kwargs):
+        t0 = time.perf_counter()
+        result = None
+        outcome = "ok"
+        try:
+            result = fn(*args, **kwargs)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 429:
+                outcome = "throttled"
+            else:
+                outcome = "errors"
+        except requests.RequestException:
+            outcome = "errors"
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+
+        with self.lock:
+            stats = self.stats[op]
+            stats.count += 1
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            stats.latency.record(elapsed_ms)
+        return result
+
+    def _connect(self) -> Optional[Client]:
+        """
+        このスレッド用の Client を作る。既定リスト ID の取得が 429 などで
+        失敗しても記録して作り直し、期間が終わるまで作れなければ None。
+        """
+        while time.monotonic() < self.ends:
+            client = self._call(
+                CONNECT_OPERATION,
+                Client,
+                graph_base=self.graph_base,
+                access_token=self.access_token,
+            )
+            if client is not None:
+                return client
+            time.sleep(
+                max(0.0, min(CONNECT_RETRY_INTERVAL, self.ends - time.monotonic()))
+            )
+        return None
+
+    def _iteration(self, client: Client, n: int) -> None:
+        todo = self._call(
+            "create_task",
+            client.create_task,
+            title=f"soak-{n}",
+            due_date=datetime.date.today(),
+            note_yaml=self.note_yaml,
+            categories=["c1"],
+        )
+        if todo is None:
+            return
+        item = self._call(
+            "add_checklist_item", client.add_checklist_item, todo.id, "soak"
+        )
+        updated = self._call(
+            "update_task_categories", client.update_task_categories, todo.id, ["c2"]
+        )
+        if item is not None and updated is not None:
+            with self.lock:
+                self.completed_iterations += 1
+
+    def _worker(self) -> None:
+        # Session を共有しないよう、スレッドごとに Client を持つ
+        try:
+            client = self._connect()
+            if client is None:
+                self._worker_failed("Client を作成できませんでした")
+                return
+            while (taken := self._take_slot()) is not None:
+                n, slot = taken
+                delay = slot - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self._iteration(client, n)
+        except Exception as e:
+            # 黙ってスレッドが消えると達成レートが下がるだけで気付けないので残す
+            self._worker_failed(f"{type(e).__name__}: {e}")
+        finally:
+            with self.lock:
+                self.active_workers -= 1
+                if self.active_workers == 0:
+                    self.finished.set()
+
+    def _worker_failed(self, reason: str) -> None:
+        print(f"ワーカーが停止しました: {reason}", file=sys.stderr)
+        with self.lock:
+            self.failed_workers.append(reason)
+
+    def _sample(self) -> None:
+        with self.lock:
+            totals = {
+                "ops": sum(s.count for s in self.stats.values()),
+                "throttled": sum(s.throttled for s in self.stats.values()),
+                "errors": sum(s.errors for s in self.stats.values()),
+            }
+        self.timeline.append(
+            {
+                "t": round(time.monotonic() - self.started, 1),
+                "rss_mb": _mb(current_rss_bytes()),
+                **totals,
+            }
+        )
+
+    def run(self) -> dict:
+        self.started = time.monotonic()
+        self.ends = self.started + self.duration
+        started_at = datetime.datetime.now().astimezone()
+        self._sample()
+
+        self.active_workers = self.workers
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+        while not self.finished.wait(self.sample_interval):
+            self._sample()
+            print(_progress_line(self.timeline[-1]), file=sys.stderr)
+        self._sample()
+
+        elapsed = time.monotonic() - self.started
+        rss = [p["rss_mb"] for p in self.timeline if p["rss_mb"] is not None]
+
+        return {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "elapsed_s": round(elapsed, 1),
+            "graph_base": self.graph_base,
+            "target_iterations_per_minute": round(60.0 / self.period, 2),
+            # 予定時刻を割り当てただけのもの（429 で途中失敗したものを含む）
+            "scheduled_iterations": self.iterations,
+            "scheduled_iterations_per_minute": round(
+                self.iterations / elapsed * 60.0, 2
+            ),
+            # 3 つの操作が全て成功したもの
+            "completed_iterations": self.completed_iterations,
+            "achieved_iterations_per_minute": round(
+                self.completed_iterations / elapsed * 60.0, 2
+            ),
+            "workers": self.workers,
+            "failed_workers": self.failed_workers,
+            "operations": {op: s.summary(elapsed) for op, s in self.stats.items()},
+            "rss_mb": {
+                "start": rss[0] if rss else None,
+                "end": rss[-1] if rss else None,
+                "max": max(rss) if rss else None,
+                "growth": round(rss[-1] - rss[0], 2) if rss else None,
+            },
+            "timeline": self.timeline,
+        }
+
+
+def _progress_line(point: dict) -> str:
+    return (
+        f"[{point['t']:>8.1f}s] ops={point['ops']} "
+        f"429={point['throttled']} errors={point['errors']} rss={point['rss_mb']}MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="To Do クライアントの負荷・耐久テスト")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=60.0,
+        help="1 分あたりのイテレーション数（1 回 = 作成 + checklist + PATCH）",
+    )
+    parser.add_argument("--duration", type=float, default=300.0, help="秒")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--sample-interval", type=float, default=10.0, help="RSS などの記録間隔（秒）"
+    )
+    parser.add_argument(
+        "--graph-base",
+        help="既に動いているモックを使う場合のベース URL（省略時は内蔵モックを起動）",
+    )
+    parser.add_argument("--token", default="soak-test", help="モックに送るトークン")
+    parser.add_argument(
+        "--mock-limit",
+        type=float,
+        default=0.0,
+        help="内蔵モックが 429 を返し始める 1 分あたりのリクエスト数（0 なら無制限）",
+    )
+    parser.add_argument(
+        "--mock-burst", type=float, default=10.0, help="内蔵モックが連続で通す数"
+    )
+    parser.add_argument(
+        "--mock-latency", type=float, default=0.0, help="内蔵モックの応答遅延（ミリ秒）"
+    )
+    parser.add_argument("--label", default="", help="比較用の名前（バージョンなど）")
+    parser.add_argument("--report", type=Path, default=Path("soak_report.json"))
+    args = parser.parse_args()
+
+    mock_proc = None
+    graph_base = args.graph_base
+    if graph_base is None:
+        mock_proc, graph_base = start_mock_server(
+            args.mock_limit, args.mock_burst, args.mock_latency
+        )
+
+    try:
+        runner = SoakRunner(
+            graph_base=graph_base,
+            access_token=args.token,
+            rate_per_minute=args.rate,
+            duration=args.duration,
+            workers=args.workers,
+            sample_interval=args.sample_interval,
+        )
+        result = runner.run()
+    finally:
+        if mock_proc is not None:
+            mock_proc.terminate()
+
+    report = {
+        "label": args.label,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock": (
+            None
+            if args.graph_base
+            else {
+                "limit_per_minute": args.mock_limit,
+                "burst": args.mock_burst,
+                "latency_ms": args.mock_latency,
+            }
+        ),
+        **result,
+    }
+    args.report.write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+    for op, summary in report["operations"].items():
+        lat = summary["latency_ms"]
+        print(
+            f"{op}: {summary['count']} 回 ({summary['ok_per_minute']} ok/分) "
+            f"p50={lat['p50']}ms p99={lat['p99']}ms "
+            f"429={summary['throttle_rate']:.1%} error={summary['error_rate']:.1%}"
+        )
+    print(
+        f"イテレーション: 予定 {report['scheduled_iterations']} 回 / "
+        f"成功 {report['completed_iterations']} 回 "
+        f"({report['achieved_iterations_per_minute']} 回/分)"
+    )
+    print(f"レポートを書き出しました: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# statefile.py
+"""
+ローカルの状態ファイル（category_state.json / token_cache.bin / export_snapshot.json）を
+複数プロセスから同時に触っても壊れないようにするための小道具。
+
+- file_lock: 対象ファイルの隣の .lock ファイルで排他ロック（advisory lock）を取る
+- atomic_write_text: 一時ファイルに書いて fsync してから rename で置き換える
+
+読む側も file_lock を取ること。Windows では誰かが開いている間は
+置き換え（os.replace）が PermissionError になる。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator
+
+if sys.platform.startswith("win"):
+    import msvcrt
+else:
+    import fcntl
+
+# Windows で置き換え先を開いているプロセスがいたときに待つ回数と間隔
+REPLACE_RETRIES = 50
+REPLACE_RETRY_INTERVAL = 0.1
+
+
+def _lock_path(path: Path) -> Path:
+    return path.with_name(path.name + ".lock")
+
+
+@contextlib.contextmanager
+def file_lock(path: str | Path) -> Iterator[None]:
+    """
+    path 用の排他ロックを取る。ロックは同じプロセス内でも入れ子にしないこと
+    （別の fd で取り直すと自分自身を待ってしまう）。
+    """
+    with open(_lock_path(Path(path)), "a+b") as f:
+        if sys.platform.startswith("win"):
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK は 10 秒ほどで諦めて OSError になるので取れるまで繰り返す
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if sys.platform.startswith("win"):
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write_text(path: str | Path, text: str, encoding: str = "utf-8") -> None:
+    """
+    path を text で置き換える。読む側からは「古い中身」か「新しい中身」の
+    どちらかしか見えず、途中で落ちても書きかけのファイルは残らない。
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # mkstemp は 0600 で作るので、既存ファイルがあれば権限を引き継ぐ
+        if path.exists():
+            os.chmod(tmp, stat.S_IMODE(path.stat().st_mode))
+
+        _replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+    _fsync_dir(path.parent)
+
+
+def _replace(src: str, dst: Path) -> None:
+    # ロックを取らずに読むプロセス（エディタやウイルス対策ソフトなど）が
+    # 開いている間は Windows で失敗するので、少し待って繰り返す
+    for _ in range(REPLACE_RETRIES - 1):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if not sys.platform.startswith("win"):
+                raise
+            time.sleep(REPLACE_RETRY_INTERVAL)
+    os.replace(src, dst)
+
+
+def _fsync_dir(directory: Path) -> None:
+    # rename 自体を永続化する（Windows ではディレクトリを開けないので何もしない）
+    if sys.platform.startswith("win"):
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,150 @@
+"""
+daemon.py で常駐させたデーモンに Unix ソケット経由で依頼を投げる薄い CLI。
+
+起動を速くするため、標準ライブラリ（と clipboard.py）以外は import しない。
+
+    python todoctl.py export
+    python todoctl.py create --title 買い物 --due 2025-12-31 --time 0:15
+    python todoctl.py create --title 掃除 --due 2025-12-31 --subtask 床 0:10
+    python todoctl.py advance
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+from clipboard import copy_to_clipboard
+
+SOCKET_PATH = Path(
+    os.environ.get("TODO_DAEMON_SOCKET", Path(__file__).parent / "todo.sock")
+)
+
+
+def send_request(command: str, timeout: float = 300.0, **params) -> dict:
+    """
+    デーモンに 1 行の JSON で依頼を送り、1 行の JSON 応答の result を返す。
+    デーモン側でエラーになった場合は RuntimeError を投げる。
+    """
+    request = {"command": command, **params}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(SOCKET_PATH))
+        sock.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as f:
+            line = f.readline()
+
+    if not line:
+        raise RuntimeError("デーモンから応答がありませんでした")
+
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise RuntimeError(response.get("error"))
+    return response["result"]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="常駐デーモン経由で To Do を操作する")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="タスク一覧を出力する")
+    p_export.add_argument(
+        "--refresh",
+        action="store_true",
+        help="スナップショットを使わず取り直す",
+    )
+    p_export.add_argument(
+        "--diff",
+        action="store_true",
+        help="前回の出力から変わったタスクだけを出力する",
+    )
+    p_export.add_argument("--format", choices=["yaml", "json"], default="yaml")
+    p_export.add_argument(
+        "--no-clipboard",
+        action="store_true",
+        help="クリップボードにコピーしない",
+    )
+
+    p_create = sub.add_parser("create", help="タスクを作成する")
+    p_create.add_argument("--title", required=True)
+    p_create.add_argument("--due", required=True, help='期限日 "YYYY-MM-DD"')
+    p_create.add_argument("--time", help='補正前時間 (例 "0:15" または "15")')
+    p_create.add_argument(
+        "--subtask",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("NAME", "TIME"),
+        help="サブタスクと推定時間（複数指定可）",
+    )
+    p_create.add_argument("--remark", default="なし", help="タスク全体の備考")
+
+    sub.add_parser("advance", help="カテゴリナンバを進める")
+    sub.add_parser("refresh", help="デーモンのスナップショットを取り直す")
+    sub.add_parser("ping", help="デーモンの状態を確認する")
+    sub.add_parser("stop", help="デーモンを停止する")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "create" and not args.time and not args.subtask:
+        print("--time か --subtask のどちらかを指定してください。", file=sys.stderr)
+        return 2
+
+    params: dict = {}
+    if args.command == "export":
+        params = {"refresh": args.refresh, "diff": args.diff, "format": args.format}
+    elif args.command == "create":
+        params = {
+            "title": args.title,
+            "due": args.due,
+            "time": args.time,
+            "subtasks": args.subtask,
+            "remark": args.remark,
+        }
+
+    try:
+        result = send_request(args.command, **params)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(
+            f"デーモンに接続できません ({SOCKET_PATH})。"
+            " 先に python daemon.py を起動してください。",
+            file=sys.stderr,
+        )
+        return 1
+    except RuntimeError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    if args.command == "export":
+        sys.stdout.write(result["text"])
+        if not args.no_clipboard:
+            copy_to_clipboard(result["text"])
+            print(
+                f"\n(上記の {args.format.upper()} をクリップボードにコピーしました)\n"
+            )
+    elif args.command == "create":
+        print(f"タスクを作成しました: {result['title']} (id={result['id']})")
+    elif args.command == "advance":
+        if result["advanced"]:
+            print(
+                f"カテゴリを {result['category']} に進め、"
+                f"未完了タスク {result['updated']} 件のカテゴリを一括更新しました。"
+            )
+        else:
+            print(
+                f"別のプロセスが先にカテゴリを {result['category']} に"
+                "進めていたため、何もしませんでした。"
+            )
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+既定リストの変更をポーリングし続け、変わったタスクだけを
+YAML / JSON のイベントとして標準出力に流す。
+
+変更があれば最短間隔でポーリングし、何も起きなければ間隔を指数的に延ばす。
+ステータスメッセージは標準エラーに出すので、標準出力はイベントだけになる。
+
+    python watch.py [--mode delta|stamp] [--format yaml|json]
+                    [--min-interval 5] [--max-interval 300]
+"""
+
+import argparse
+import datetime
+import json
+import sys
+import time
+from typing import Optional
+
+import requests
+
+from client import Client
+from encoders import dump_yaml
+from main import build_export_task
+from models import TodoTask
+
+
+class AdaptiveInterval:
+    """
+    ポーリング間隔。変更があれば min_interval に戻し、
+    変化なしが続くと factor 倍ずつ max_interval まで延ばす。
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, factor: float = 2.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.current = min_interval
+
+    def on_change(self) -> None:
+        self.current = self.min_interval
+
+    def on_idle(self) -> None:
+        self.current = min(self.current * self.factor, self.max_interval)
+
+    def on_throttled(self, retry_after: Optional[float]) -> None:
+        # 429 のときは Retry-After より短くはしない
+        self.on_idle()
+        if retry_after is not None:
+            self.current = max(self.current, retry_after)
+
+
+class TaskWatcher:
+    """
+    前回見たタスクの lastModifiedDateTime を覚えておき、
+    ポーリングごとに added / changed / removed のイベントを作る。
+
+    mode="delta": Graph の delta クエリで差分だけ取得する（通常はこちら）
+    mode="stamp": 毎回全件取得して lastModifiedDateTime を比較する
+    """
+
+    def __init__(self, client: Client, mode: str = "delta", emit_initial: bool = False):
+        self.client = client
+        self.mode = mode
+        self.emit_initial = emit_initial
+        self.delta_link: Optional[str] = None
+        # id -> (lastModifiedDateTime, title)。None なら基準未作成
+        self.known: Optional[dict[str, tuple[Optional[str], str]]] = None
+
+    def poll(self) -> list[dict]:
+        """
+        1 回ポーリングしてイベントの list を返す。
+        初回は基準を作るだけ（emit_initial=True なら全件 added として返す）。
+
+        途中（checklist の取得など）で例外になった場合は deltaLink も known も
+        進めないので、次のポーリングで同じ変更がもう一度イベントになる。
+        """
+        delta_link = self.delta_link
+        if self.mode == "delta":
+            full_sync = delta_link is None
+            try:
+                tasks, removed_ids, delta_link = self.client.get_tasks_delta(delta_link)
+            except requests.HTTPError as e:
+                # deltaLink が失効していたら全件同期からやり直す
+                if e.response is None or e.response.status_code != 410:
+                    raise
+                full_sync = True
+                tasks, removed_ids, delta_link = self.client.get_tasks_delta()
+        else:
+            full_sync = True
+            tasks = self.client.get_tasks_all()
+            removed_ids = []
+
+        events, known = self._diff(tasks, removed_ids, full_sync)
+
+        # イベントが全部作れてから状態を進める
+        self.delta_link = delta_link
+        self.known = known
+        return events
+
+    def _diff(
+        self, tasks: list[TodoTask], removed_ids: list[str], full_sync: bool
+    ) -> tuple[list[dict], dict[str, tuple[Optional[str], str]]]:
+        """
+        (イベント, 新しい known) を返す。self.known 自体は書き換えない。
+        """
+        baseline = self.known is None
+        emit = not baseline or self.emit_initial
+        known = dict(self.known) if self.known is not None else {}
+
+        events: list[dict] = []
+        seen: set[str] = set()
+
+        for t in tasks:
+            seen.add(t.id)
+            if t.id not in known:
+                kind = "added"
+            elif known[t.id][0] != t.lastModifiedDateTime:
+                kind = "changed"
+            else:
+                continue
+
+            known[t.id] = (t.lastModifiedDateTime, t.title)
+            if emit:
+                # checklist は変わったタスクの分だけ取りに行く
+                events.append(self._task_event(kind, t))
+
+        # 全件同期のときは「今回見えなかったもの」も削除扱い
+        if full_sync:
+            removed_ids = removed_ids + [tid for tid in known if tid not in seen]
+
+        for tid in removed_ids:
+            if tid not in known:
+                continue
+            _, title = known.pop(tid)
+            if emit:
+                events.append(
+                    {
+                        "event": "removed",
+                        "id": tid,
+                        "detected_at": _now_iso(),
+                        "title": title,
+                    }
+                )
+
+        return events, known
+
+    def _task_event(self, kind: str, t: TodoTask) -> dict:
+        return {
+            "event": kind,
+            "id": t.id,
+            "detected_at": _now_iso(),
+            "status": t.status,
+            "categories": t.categories,
+            "task": build_export_task(self.client, t).model_dump(mode="python"),
+        }
+
+
+def _now_iso() -> str:
+    return datetime.datetime.now().astimezone().isoformat(timespec="seconds")
+
+
+def _retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def emit_event(event: dict, fmt: str) -> None:
+    """
+    イベント 1 件を出力する。json は 1 行 1 イベント、yaml は 1 ドキュメント 1 イベント。
+    """
+    if fmt == "json":
+        sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+    else:
+        sys.stdout.write("---\n" + dump_yaml(event))
+    sys.stdout.flush()
+
+
+def watch(client: Client, watcher: TaskWatcher, interval: AdaptiveInterval, fmt: str):
+    while True:
+        try:
+            # トークンは Client が期限間近・401 のときだけ取り直す
+            events = watcher.poll()
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 429:
+                interval.on_throttled(_retry_after_seconds(e.response))
+                print(
+                    f"スロットリングされました。{interval.current:.0f} 秒待ちます。",
+                    file=sys.stderr,
+                )
+            else:
+                interval.on_idle()
+                print(f"ポーリングに失敗しました: {e}", file=sys.stderr)
+        except requests.RequestException as e:
+            interval.on_idle()
+            print(f"ポーリングに失敗しました: {e}", file=sys.stderr)
+        except (KeyError, ValueError) as e:
+            # 想定外の応答（deltaLink 欠落や pydantic の ValidationError など）でも
+            # 監視は止めずに間隔を空けて続ける
+            interval.on_idle()
+            print(f"応答を解釈できませんでした: {e!r}", file=sys.stderr)
+        else:
+            for event in events:
+                emit_event(event, fmt)
+
+            if events:
+                interval.on_change()
+            else:
+                interval.on_idle()
+
+        time.sleep(interval.current)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="To Do の変更を監視する")
+    parser.add_argument(
+        "--mode",
+        choices=["delta", "stamp"],
+        default="delta",
+        help="delta クエリで差分取得するか、毎回全件の更新日時を比較するか",
+    )
+    parser.add_argument("--format", choices=["yaml", "json"], default="yaml")
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=5.0,
+        help="変更が続いているときのポーリング間隔（秒）",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=300.0,
+        help="変化がないときに延ばすポーリング間隔の上限（秒）",
+    )
+    parser.add_argument(
+        "--emit-initial",
+        action="store_true",
+        help="起動時点のタスクも全て added イベントとして出力する",
+    )
+    args = parser.parse_args()
+
+    client = Client()
+    watcher = TaskWatcher(client, mode=args.mode, emit_initial=args.emit_initial)
+    interval = AdaptiveInterval(args.min_interval, args.max_interval)
+
+    print(
+        f"監視を開始しました (mode={args.mode}, "
+        f"{args.min_interval:g}〜{args.max_interval:g} 秒間隔)",
+        file=sys.stderr,
+    )
+    try:
+        watch(client, watcher, interval, args.format)
+    except KeyboardInterrupt:
+        print("監視を終了しました。", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()